@@ -0,0 +1,69 @@
+"""
+Hot-path numeric kernels for gesture detection
+JIT-compiled with Numba when it is installed, plain Python otherwise
+"""
+
+import sys
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# Landmark indices as plain module ints (Numba freezes globals at compile time)
+THUMB_TIP = 4
+INDEX_FINGER_TIP = 8
+
+
+def _pinch_state(pts, pinch_thr_sq, open_thr_sq):
+    """
+    Test thumb-index distance against both pinch thresholds in one pass
+    
+    Args:
+        pts: (21, 3) float32 landmark array
+        pinch_thr_sq: Squared pinch threshold
+        open_thr_sq: Squared open pinch threshold
+        
+    Returns:
+        tuple: (is_pinch, is_open_pinch)
+    """
+    dx = pts[THUMB_TIP, 0] - pts[INDEX_FINGER_TIP, 0]
+    dy = pts[THUMB_TIP, 1] - pts[INDEX_FINGER_TIP, 1]
+    dz = pts[THUMB_TIP, 2] - pts[INDEX_FINGER_TIP, 2]
+    d2 = dx * dx + dy * dy + dz * dz
+    return d2 < pinch_thr_sq, d2 > open_thr_sq
+
+
+def _pinch_state_py(pts, pinch_thr_sq, open_thr_sq):
+    """
+    Pure-Python equivalent of _pinch_state for when Numba isn't installed
+    
+    Pulls the two tips out as Python floats first so the arithmetic runs on
+    plain floats instead of going through NumPy scalar dispatch.
+    """
+    tx, ty, tz = pts[THUMB_TIP].tolist()
+    ix, iy, iz = pts[INDEX_FINGER_TIP].tolist()
+    dx = tx - ix
+    dy = ty - iy
+    dz = tz - iz
+    d2 = dx * dx + dy * dy + dz * dz
+    return d2 < pinch_thr_sq, d2 > open_thr_sq
+
+
+pinch_state = _pinch_state_py
+if njit is not None:
+    try:
+        # No on-disk cache in a PyInstaller build - there is no source file
+        # for Numba's cache locator, and cache=True fails at compile time
+        pinch_state = njit(
+            '(f4[:,::1],f4,f4)',
+            cache=not getattr(sys, 'frozen', False),
+            fastmath=True
+        )(_pinch_state)
+        # Warm up so the first camera frame doesn't pay for compilation
+        pinch_state(np.zeros((21, 3), dtype=np.float32), 0.0, 0.0)
+    except Exception:
+        # Any JIT/cache failure must not take the app down - use plain Python
+        pinch_state = _pinch_state_py
@@ -0,0 +1,227 @@
+"""
+Camera Utilities Module
+Background frame capture so the gesture loops always work on the freshest frame
+"""
+
+import threading
+import time
+import platform
+import cv2
+import numpy as np
+from config import CAMERA_INDEX, CAMERA_WIDTH, CAMERA_HEIGHT
+
+
+# Set once the BUFFERSIZE warning has been printed
+_buffersize_warned = False
+
+
+def pick_backend():
+    """
+    Choose the native capture backend for this OS
+    
+    Letting OpenCV auto-select can fall through to FFMPEG on Linux, which
+    probes the stream format for seconds before the first frame.
+    
+    Returns:
+        int: cv2.CAP_* backend id
+    """
+    system = platform.system()
+    if system == 'Windows':
+        return cv2.CAP_DSHOW
+    if system == 'Linux':
+        return cv2.CAP_V4L2
+    if system == 'Darwin':
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+
+def open_camera(index=CAMERA_INDEX):
+    """
+    Open and configure the webcam
+    
+    Args:
+        index: Camera index
+        
+    Returns:
+        cv2.VideoCapture: Capture object (check isOpened())
+    """
+    backend = pick_backend()
+    cap = cv2.VideoCapture(index, backend)
+    if not cap.isOpened() and backend != cv2.CAP_ANY:
+        # Native backend missing from this OpenCV build - let OpenCV choose
+        cap.release()
+        cap = cv2.VideoCapture(index)
+    
+    # MJPG is what most webcams stream at 720p; setting it skips format probing
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+    
+    # Keep only the freshest frame in the driver so gestures are judged on
+    # the current hand position, not one buffered 100-200 ms ago
+    # (warned once per process - the receiver's retry loop calls this repeatedly)
+    global _buffersize_warned
+    if cap.isOpened() and not cap.set(cv2.CAP_PROP_BUFFERSIZE, 1) and not _buffersize_warned:
+        _buffersize_warned = True
+        print("  Failed to reduce capture buffer size. Latency will be higher!")
+    
+    return cap
+
+
+def warm_up(cap, timeout=0.2, tolerance=2.0, min_level=10.0, stable_frames=2):
+    """
+    Read frames until auto-exposure settles, instead of a fixed delay
+    
+    Many webcams deliver a few all-black frames first, so frames darker than
+    min_level don't count. After the first lit frame, warmup ends once
+    stable_frames consecutive frames stay within tolerance of the previous
+    one's mean brightness - usually a handful of frames - or when the
+    timeout passes (e.g. a genuinely dark room).
+    
+    Frames are read (decoded), not just grab()bed: brightness can only be
+    measured on a decoded image, and stopping early saves more than
+    decoding the few warmup frames costs.
+    
+    Args:
+        cap: Opened cv2.VideoCapture
+        timeout: Maximum seconds to spend
+        tolerance: Mean brightness change (0-255) counted as stable
+        min_level: Mean brightness below which a frame counts as not lit yet
+        stable_frames: Consecutive stable frames needed
+    """
+    deadline = time.monotonic() + timeout
+    prev_level = None
+    stable = 0
+    while time.monotonic() < deadline:
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        b, g, r, _ = cv2.mean(frame)
+        level = (b + g + r) / 3
+        if level < min_level:
+            # Sensor still dark - start over once it lights up
+            prev_level = None
+            stable = 0
+            continue
+        if prev_level is not None and abs(level - prev_level) < tolerance:
+            stable += 1
+            if stable >= stable_frames:
+                return
+        else:
+            stable = 0
+        prev_level = level
+
+
+def mirror(frame, out=None):
+    """
+    Flip a frame horizontally (selfie view) into a reused buffer
+    
+    Args:
+        frame: BGR frame
+        out: Buffer returned by the previous call, or None
+        
+    Returns:
+        np.ndarray: The mirrored frame - pass it back as out next time
+    """
+    if out is None or out.shape != frame.shape:
+        out = np.empty_like(frame)
+    return cv2.flip(frame, 1, dst=out)
+
+
+def poll_key():
+    """
+    Pump the HighGUI event loop and return the pressed key, without sleeping
+    
+    cv2.pollKey() (OpenCV 4.5+) returns immediately; waitKey(1) blocks for
+    at least 1 ms of every frame. Falls back to waitKey(1) on older builds.
+    
+    Returns:
+        int: Key code masked to 8 bits (255 if no key was pressed)
+    """
+    return _poll_key() & 0xFF
+
+
+_poll_key = getattr(cv2, "pollKey", None) or (lambda: cv2.waitKey(1))
+
+
+class CameraReader:
+    """Drains a VideoCapture on a background thread and hands out the latest frame"""
+    
+    def __init__(self, cap):
+        """
+        Args:
+            cap: Opened cv2.VideoCapture
+        """
+        self.cap = cap
+        self._cond = threading.Condition()
+        self._latest = None
+        self._has_new = False
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the capture thread"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        """
+        Capture loop
+        
+        Every grab() is followed by retrieve() and the result overwrites the
+        slot, so the driver buffer never backs up and read_latest() always
+        gets the most recent frame, however slow the consumer is.
+        """
+        while not self._stop_event.is_set():
+            if not self.cap.grab():
+                # Camera hiccup - read_latest() times out and the caller counts it
+                self._stop_event.wait(0.01)
+                continue
+            
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                continue
+            
+            with self._cond:
+                self._latest = frame
+                self._has_new = True
+                self._cond.notify()
+    
+    def read_latest(self, timeout=0.1):
+        """
+        Get the newest frame not yet returned
+        
+        Args:
+            timeout: Seconds to wait for a fresh frame
+        
+        Returns:
+            tuple: (ret, frame) like cv2.VideoCapture.read()
+        """
+        with self._cond:
+            if not self._has_new:
+                self._cond.wait_for(lambda: self._has_new, timeout)
+            if not self._has_new:
+                return False, None
+            
+            frame = self._latest
+            self._latest = None
+            self._has_new = False
+            return True, frame
+    
+    def stop(self):
+        """
+        Stop the capture thread
+        
+        The caller still releases the VideoCapture, but only if this returns
+        True - releasing while the thread is inside grab() can crash the
+        backend.
+        
+        Returns:
+            bool: True once the capture thread has exited
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            return not self._thread.is_alive()
+        return True
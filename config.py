@@ -7,7 +7,9 @@ Contains all network settings, gesture thresholds, and system parameters
 UDP_PORT = 37020  # Port for device discovery broadcasts
 TCP_PORT = 37021  # Port for file transfer
 BROADCAST_INTERVAL = 2  # Seconds between broadcast messages
-BUFFER_SIZE = 4096  # File transfer buffer size (4KB chunks)
+BUFFER_SIZE = 1024 * 1024  # File transfer buffer size (1MB chunks)
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024  # TCP send/receive buffer size (4MB) for file transfer sockets
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024  # Received data is collected up to this size (4MB) before each disk write
 DISCOVERY_TIMEOUT = 10  # Seconds to wait for receiver discovery
 
 # Gesture Detection Configuration
@@ -15,12 +17,17 @@ PINCH_THRESHOLD = 0.08  # Distance threshold for pinch detection (higher = easie
 OPEN_PINCH_THRESHOLD = 0.15  # Distance threshold for open pinch detection (spread fingers)
 GESTURE_HOLD_TIME = 0.5  # Seconds to hold gesture before triggering
 CONFIDENCE_THRESHOLD = 0.3  # Minimum hand detection confidence (lower = detects hands more easily)
+FRAME_DIFF_THRESHOLD = 2.0  # Mean pixel difference below which the last detection is reused
+RESULT_REUSE_MAX_AGE = 0.2  # Seconds a cached detection may be reused for near-identical frames
+INFERENCE_FRAME_STRIDE = 3  # Run detection only every Nth frame, reusing the last result in between (1 = every frame)
+LANDMARK_CACHE_STRIDE = 6  # Same, once a gesture has triggered and only a release needs noticing
 
 # Camera Configuration
 CAMERA_INDEX = 0  # Default webcam index
 CAMERA_WIDTH = 1280
 CAMERA_HEIGHT = 720
 FPS_TARGET = 30
+INFERENCE_WIDTH = 384  # Frame is downscaled to this width before hand detection (height keeps aspect ratio)
 
 # File Transfer Configuration
 RECEIVED_FILES_DIR = "received_files"  # Directory to save received files
@@ -11,9 +11,26 @@ from mediapipe.tasks.python import vision
 import numpy as np
 import time
 import os
+import hashlib
+import operator
 import urllib.request
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from _kernels import pinch_state
 from config import PINCH_THRESHOLD, GESTURE_HOLD_TIME, CONFIDENCE_THRESHOLD
 from config import COLOR_GREEN, COLOR_RED, COLOR_BLUE, COLOR_YELLOW, OPEN_PINCH_THRESHOLD
+from config import INFERENCE_WIDTH, CAMERA_WIDTH, CAMERA_HEIGHT
+from config import FRAME_DIFF_THRESHOLD, RESULT_REUSE_MAX_AGE, INFERENCE_FRAME_STRIDE, LANDMARK_CACHE_STRIDE
+
+
+# Make sure OpenCV's SIMD/IPP paths are on, and leave half the cores to
+# MediaPipe's inference worker instead of oversubscribing on small frames
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(1, (os.cpu_count() or 2) // 2))
+
+# Nothing here uses UMat, so skip the OpenCL device probe and per-call
+# dispatch checks
+cv2.ocl.setUseOpenCL(False)
 
 
 # Hand landmark indices (matching the old API)
@@ -51,20 +68,125 @@ HAND_CONNECTIONS = [
     (5, 9), (9, 13), (13, 17)  # Palm
 ]
 
+_SRGB = mp.ImageFormat.SRGB
+
+# Fetches (x, y, z) from a landmark in a single C-level call
+_XYZ = operator.attrgetter('x', 'y', 'z')
+
+# Hand landmarker model (float16) and its pinned SHA256
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
+MODEL_SHA256 = "fbc2a30080c3c557093b5ddfc334698132eb341044ccee322ccf8bcf3607cde1"
+
+# (23, 2) landmark index pairs, used to gather all segment endpoints at once
+_CONN = np.array(HAND_CONNECTIONS, dtype=np.int32)
+
+NUM_LANDMARKS = 21
+
+# Squared thresholds - distances are compared squared so no sqrt is needed
+PINCH_THRESHOLD_SQ = PINCH_THRESHOLD ** 2
+OPEN_PINCH_THRESHOLD_SQ = OPEN_PINCH_THRESHOLD ** 2
+
+# Status labels per gesture state: (text, color). "holding" is formatted with progress.
+PINCH_LABELS = {
+    "no_hand": ("No hand detected", COLOR_RED),
+    "triggered": ("GESTURE TRIGGERED!", COLOR_YELLOW),
+    "holding": ("Pinching... {progress}%", COLOR_GREEN),
+    "done": ("Gesture completed - Ready for next", COLOR_BLUE),
+    "idle": ("Hand detected - Make pinch gesture", COLOR_GREEN),
+}
+
+OPEN_PINCH_LABELS = {
+    "no_hand": ("No hand detected - Show open hand", COLOR_RED),
+    "triggered": ("ACCEPTING FILE!", COLOR_YELLOW),
+    "holding": ("Open pinch... {progress}%", COLOR_GREEN),
+    "done": ("File accepted!", COLOR_BLUE),
+    "idle": ("Spread thumb & index to accept", COLOR_GREEN),
+}
+
+# Index into the (is_pinch, is_open_pinch) tuple returned by detect_pinch_state
+PINCH = 0
+OPEN_PINCH = 1
+
+# Progress bar dimensions
+BAR_X = 10
+BAR_Y = 50
+BAR_WIDTH = 300
+BAR_HEIGHT = 30
+
+
+def render_text_strip(lines, width, height, scale):
+    """
+    Rasterize static white labels once into a strip for the bottom of a frame
+    
+    Labels that don't change during a session can then be applied per frame
+    with blit_text_strip() - a masked copy instead of Hershey glyph rendering.
+    
+    Args:
+        lines: Iterable of (text, baseline_y) with y measured within the strip
+        width: Frame width
+        height: Strip height
+        scale: Font scale
+        
+    Returns:
+        tuple: (strip, mask)
+    """
+    strip = np.zeros((height, width, 3), dtype=np.uint8)
+    for text, y in lines:
+        cv2.putText(strip, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), 2)
+    # Drawn without anti-aliasing, so every lit pixel belongs to the text
+    mask = strip.any(axis=2, keepdims=True)
+    return strip, mask
+
+
+def blit_text_strip(frame, overlay):
+    """Copy a render_text_strip() overlay onto the bottom of a frame in place"""
+    strip, mask = overlay
+    np.copyto(frame[-strip.shape[0]:], strip, where=mask)
+
+
+# Height of the strip holding the incoming-file labels drawn by render()
+RECEIVER_INFO_STRIP_HEIGHT = 80
+
+
+class GestureState:
+    """Result of gesture inference on one frame, consumed by GestureDetector.render"""
+    
+    def __init__(self, pts=None, status_text="", status_color=COLOR_RED,
+                 hold_progress=None, gesture_detected=False):
+        self.pts = pts
+        self.status_text = status_text
+        self.status_color = status_color
+        self.hold_progress = hold_progress  # 0.0-1.0 while holding, None otherwise
+        self.gesture_detected = gesture_detected
+
 
 class GestureDetector:
     """Detects hand gestures using MediaPipe Hands Tasks API"""
     
-    def __init__(self):
-        """Initialize MediaPipe Hands model"""
+    def __init__(self, show_landmarks=True):
+        """
+        Initialize MediaPipe Hands model
+        
+        Args:
+            show_landmarks: Draw the full hand skeleton; if False only the
+                thumb and index fingertips are marked
+        """
+        self.show_landmarks = show_landmarks
+        
         # Download the hand landmarker model if not exists
         model_path = self._get_model_path()
         
         # Create hand landmarker options
-        base_options = python.BaseOptions(model_asset_path=model_path)
+        # CPU delegate runs the model through XNNPACK's vectorized kernels
+        base_options = python.BaseOptions(
+            model_asset_path=model_path,
+            delegate=python.BaseOptions.Delegate.CPU
+        )
         options = vision.HandLandmarkerOptions(
             base_options=base_options,
-            running_mode=vision.RunningMode.IMAGE,
+            # VIDEO mode lets MediaPipe track landmarks between frames and
+            # only rerun palm detection when tracking is lost
+            running_mode=vision.RunningMode.VIDEO,
             num_hands=1,
             min_hand_detection_confidence=CONFIDENCE_THRESHOLD,
             min_hand_presence_confidence=CONFIDENCE_THRESHOLD,
@@ -73,14 +195,73 @@ class GestureDetector:
         
         self.detector = vision.HandLandmarker.create_from_options(options)
         
-        # Gesture state tracking
-        self.pinch_start_time = None
-        self.is_pinching = False
-        self.gesture_triggered = False
+        # VIDEO mode requires strictly increasing timestamps
+        self._last_timestamp_ms = -1
+        
+        # Gesture state tracking (hold start time + whether already fired)
+        self._pinch_state = {"start": None, "triggered": False}
+        self._open_pinch_state = {"start": None, "triggered": False}
+        self._gestures = {
+            PINCH: (self._pinch_state, PINCH_LABELS),
+            OPEN_PINCH: (self._open_pinch_state, OPEN_PINCH_LABELS),
+        }
+        
+        # Reused downscaled buffers for MediaPipe input (avoids per-frame allocations),
+        # sized for the configured camera and resized if the real frames differ
+        self._alloc_inference_buffers((CAMERA_HEIGHT, CAMERA_WIDTH))
+        
+        # Static progress bar chrome (gray fill + white border), copied into
+        # the frame instead of being redrawn every frame
+        self._bar_template = np.full((BAR_HEIGHT + 1, BAR_WIDTH + 1, 3), 100, dtype=np.uint8)
+        cv2.rectangle(self._bar_template, (0, 0), (BAR_WIDTH, BAR_HEIGHT), (255, 255, 255), 2)
+        
+        # Per-percent (0-100) bar drawing params: (label, label origin, fill width, fill color)
+        self._bar_lut = []
+        for p in range(101):
+            label = f"{p}%"
+            text_w, text_h = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+            origin = (BAR_X + (BAR_WIDTH - text_w) // 2, BAR_Y + (BAR_HEIGHT + text_h) // 2)
+            # Color transitions from red to green as progress increases
+            color = (0, int(255 * p / 100), int(255 * (100 - p) / 100))
+            self._bar_lut.append((label, origin, BAR_WIDTH * p // 100, color))
+        
+        # Last detected result, reused while the scene is static
+        self._last_result = None
+        self._last_result_time = 0.0
+        
+        # Frame count for the detection stride (reset when a gesture triggers)
+        self._frame_counter = 0
+        
+        # Pre-rendered pending_info labels, keyed on (pending_info, frame width)
+        self._info_key = None
+        self._info_overlay = None
+        
+        # Inference runs on a single worker so the camera loop never blocks on
+        # MediaPipe; at most one frame is in flight, newer frames are dropped
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._pending_time = 0.0
+    
+    def _alloc_inference_buffers(self, frame_hw):
+        """
+        Allocate the downscaled inference buffers for a given frame size
+        
+        The working height follows the frame's aspect ratio so the hand
+        isn't squashed before it reaches the palm detector.
         
-        # Open pinch state tracking
-        self.open_pinch_start_time = None
-        self.open_pinch_triggered = False
+        Args:
+            frame_hw: (height, width) of the full-resolution frame
+        """
+        frame_h, frame_w = frame_hw
+        infer_h = max(1, round(INFERENCE_WIDTH * frame_h / frame_w))
+        shape = (infer_h, INFERENCE_WIDTH, 3)
+        
+        self._frame_hw = (frame_h, frame_w)
+        self._infer_size = (INFERENCE_WIDTH, infer_h)
+        self._small_buf = np.empty(shape, dtype=np.uint8)
+        self._rgb_buf = np.empty(shape, dtype=np.uint8)
+        # Last frame sent to inference, for the static-scene check
+        self._last_small = np.zeros(shape, dtype=np.uint8)
     
     def _get_model_path(self):
         """Download and return path to hand landmarker model"""
@@ -89,203 +270,343 @@ class GestureDetector:
         
         if not os.path.exists(model_path):
             print("Downloading hand landmarker model...")
-            url = "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
-            urllib.request.urlretrieve(url, model_path)
+            # Download to a temp file and only rename once verified, so an
+            # interrupted download never leaves a truncated model behind
+            part_path = model_path + ".part"
+            try:
+                urllib.request.urlretrieve(MODEL_URL, part_path)
+                
+                sha256 = hashlib.sha256()
+                with open(part_path, 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        sha256.update(block)
+                
+                if sha256.hexdigest() != MODEL_SHA256:
+                    raise RuntimeError("Downloaded model failed checksum verification")
+                
+                os.replace(part_path, model_path)
+            except Exception:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
             print("✓ Model downloaded")
         
         return model_path
         
-    def calculate_distance(self, point1, point2):
+    def _detect(self, rgb_frame):
         """
-        Calculate Euclidean distance between two points
+        Run hand landmark detection on one video frame (worker thread)
+        
+        mp.Image copies the pixels into its own ImageFrame on construction,
+        so a single wrapper can't be reused across frames. Building it here
+        keeps that copy off the camera loop; rgb_frame is the C-contiguous
+        reused buffer, which isn't touched again until this call returns.
         
         Args:
-            point1: First landmark point (x, y, z)
-            point2: Second landmark point (x, y, z)
+            rgb_frame: Downscaled RGB image (uint8, C-contiguous)
             
         Returns:
-            float: Distance between points
+            HandLandmarkerResult: Detection results
         """
-        return np.sqrt(
-            (point1.x - point2.x) ** 2 +
-            (point1.y - point2.y) ** 2 +
-            (point1.z - point2.z) ** 2
-        )
+        mp_image = mp.Image(image_format=_SRGB, data=rgb_frame)
+        
+        timestamp_ms = int(time.monotonic() * 1000)
+        if timestamp_ms <= self._last_timestamp_ms:
+            timestamp_ms = self._last_timestamp_ms + 1
+        self._last_timestamp_ms = timestamp_ms
+        
+        return self.detector.detect_for_video(mp_image, timestamp_ms)
     
-    def detect_pinch(self, landmarks):
+    def _collect_pending(self):
+        """Take the result of a finished background inference, if any"""
+        if self._pending is not None and self._pending.done():
+            self._last_result = self._pending.result()
+            self._last_result_time = self._pending_time
+            self._pending = None
+    
+    def detect_hands(self, frame, now=None):
         """
-        Detect pinch gesture (thumb tip touching index finger tip)
+        Detect hand landmarks in a BGR frame
+        
+        The frame is downscaled first; landmarks are normalized to 0-1, so
+        they map straight back onto the full-resolution frame. Inference runs
+        on a background worker: this submits the frame if the worker is idle
+        and returns the most recent finished result, which may lag the frame
+        by one inference. If the frame is nearly identical to the last one
+        submitted, the cached result is returned and nothing is submitted.
         
         Args:
-            landmarks: List of hand landmarks
+            frame: OpenCV frame (BGR image)
+            now: Optional time.monotonic() timestamp for this frame
             
         Returns:
-            bool: True if pinch detected, False otherwise
+            HandLandmarkerResult: Latest detection results, or None before the
+                first inference has finished
         """
-        # Get thumb tip and index finger tip landmarks
-        thumb_tip = landmarks[HandLandmark.THUMB_TIP]
-        index_tip = landmarks[HandLandmark.INDEX_FINGER_TIP]
+        self._collect_pending()
+        
+        # Worker busy - keep showing the latest result, drop this frame
+        if self._pending is not None:
+            return self._last_result
+        
+        # Camera delivered a different size than configured - resize buffers once
+        if frame.shape[:2] != self._frame_hw:
+            self._alloc_inference_buffers(frame.shape[:2])
+            self._last_result = None
+        
+        # Downscale into reused buffer
+        cv2.resize(
+            frame,
+            self._infer_size,
+            dst=self._small_buf,
+            interpolation=cv2.INTER_AREA
+        )
+        
+        # Reuse recent result if the scene hasn't changed
+        if now is None:
+            now = time.monotonic()
+        if self._last_result is not None and now - self._last_result_time < RESULT_REUSE_MAX_AGE:
+            # Mean absolute pixel difference, computed without a temp image
+            diff = cv2.norm(self._small_buf, self._last_small, cv2.NORM_L1) / self._small_buf.size
+            if diff < FRAME_DIFF_THRESHOLD:
+                return self._last_result
         
-        # Calculate distance between thumb and index finger
-        distance = self.calculate_distance(thumb_tip, index_tip)
+        # Convert BGR to RGB for MediaPipe (safe to reuse - worker is idle)
+        cv2.cvtColor(self._small_buf, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
         
-        return distance < PINCH_THRESHOLD
+        np.copyto(self._last_small, self._small_buf)
+        self._pending = self._pool.submit(self._detect, self._rgb_buf)
+        self._pending_time = now
+        
+        return self._last_result
     
-    def detect_open_pinch(self, landmarks):
+    def landmarks_to_array(self, landmarks):
         """
-        Detect open pinch gesture (thumb and index finger spread apart)
+        Convert MediaPipe landmarks to a (21, 3) float32 array
         
         Args:
             landmarks: List of hand landmarks
             
         Returns:
-            bool: True if open pinch detected, False otherwise
+            np.ndarray: (21, 3) array of x, y, z coordinates
         """
-        # Get thumb tip and index finger tip landmarks
-        thumb_tip = landmarks[HandLandmark.THUMB_TIP]
-        index_tip = landmarks[HandLandmark.INDEX_FINGER_TIP]
-        
-        # Calculate distance between thumb and index finger
-        distance = self.calculate_distance(thumb_tip, index_tip)
+        # MediaPipe's Python result has no raw-array accessor, so flatten
+        # with attrgetter + chain to keep the per-landmark work in C; the
+        # 63-float array fromiter builds is used directly (no second copy)
+        return np.fromiter(
+            chain.from_iterable(map(_XYZ, landmarks)),
+            dtype=np.float32,
+            count=NUM_LANDMARKS * 3
+        ).reshape(NUM_LANDMARKS, 3)
+        
+    def detect_pinch_state(self, pts):
+        """
+        Detect pinch and open pinch in a single fused kernel call
         
-        # Open pinch = fingers spread apart
-        return distance > OPEN_PINCH_THRESHOLD
+        Args:
+            pts: (21, 3) landmark array
+            
+        Returns:
+            tuple: (is_pinch, is_open_pinch)
+        """
+        return pinch_state(pts, PINCH_THRESHOLD_SQ, OPEN_PINCH_THRESHOLD_SQ)
     
-    def draw_landmarks(self, frame, landmarks):
+    def draw_landmarks(self, frame, pts):
         """Draw hand landmarks on frame"""
         h, w, _ = frame.shape
         
-        # Draw connections
-        for connection in HAND_CONNECTIONS:
-            start_idx, end_idx = connection
-            start = landmarks[start_idx]
-            end = landmarks[end_idx]
-            
-            start_point = (int(start.x * w), int(start.y * h))
-            end_point = (int(end.x * w), int(end.y * h))
-            
-            cv2.line(frame, start_point, end_point, COLOR_BLUE, 2)
+        # Scale normalized coordinates to pixels in one vectorized step
+        xy = (pts[:, :2] * np.array([w, h], dtype=np.float32)).astype(np.int32)
+        
+        # Draw all connections in one call - xy[_CONN] is (23, 2, 2) segments
+        cv2.polylines(frame, xy[_CONN], False, COLOR_BLUE, 2)
         
         # Draw landmarks
-        for landmark in landmarks:
-            cx, cy = int(landmark.x * w), int(landmark.y * h)
-            cv2.circle(frame, (cx, cy), 5, COLOR_GREEN, -1)
-            cv2.circle(frame, (cx, cy), 7, COLOR_GREEN, 1)
+        for point in map(tuple, xy.tolist()):
+            cv2.circle(frame, point, 5, COLOR_GREEN, -1)
+            cv2.circle(frame, point, 7, COLOR_GREEN, 1)
     
-    def process_frame(self, frame):
+    def draw_fingertips(self, frame, pts):
+        """Mark only the thumb and index fingertips (cheap alternative to draw_landmarks)"""
+        h, w, _ = frame.shape
+        
+        for idx in (HandLandmark.THUMB_TIP, HandLandmark.INDEX_FINGER_TIP):
+            x, y = pts[idx, :2].tolist()
+            cv2.circle(frame, (int(x * w), int(y * h)), 7, COLOR_GREEN, -1)
+    
+    def draw_progress_bar(self, frame, progress):
         """
-        Process a video frame to detect pinch gesture (for sender)
+        Draw the gesture hold progress bar
         
         Args:
             frame: OpenCV frame (BGR image)
-            
-        Returns:
-            tuple: (processed_frame, gesture_detected)
-                - processed_frame: Frame with hand landmarks drawn
-                - gesture_detected: True if pinch gesture completed
+            progress: Hold progress from 0.0 to 1.0
         """
-        # Convert BGR to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Copy static background + border
+        roi = frame[BAR_Y:BAR_Y + BAR_HEIGHT + 1, BAR_X:BAR_X + BAR_WIDTH + 1]
+        np.copyto(roi, self._bar_template)
         
-        # Create MediaPipe Image
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        label, origin, fill_width, color = self._bar_lut[int(progress * 100)]
         
-        # Detect hands
-        results = self.detector.detect(mp_image)
+        # Draw progress (green gradient), inside the 2 px border so the
+        # outline keeps its full width around the filled part too
+        if fill_width > 2:
+            fill_end = min(fill_width, BAR_WIDTH - 2)
+            cv2.rectangle(frame, (BAR_X + 2, BAR_Y + 2), (BAR_X + fill_end, BAR_Y + BAR_HEIGHT - 2), color, -1)
+        
+        # Draw percentage text on bar
+        cv2.putText(frame, label, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    
+    def infer(self, frame, gesture=PINCH):
+        """
+        Run hand detection and the hold-to-trigger state machine on a frame
+        
+        Nothing is drawn; pass the returned state to render() only for frames
+        that will actually be displayed.
+        
+        Args:
+            frame: OpenCV frame (BGR image)
+            gesture: PINCH (sender) or OPEN_PINCH (receiver)
+            
+        Returns:
+            GestureState: Landmarks, status and hold progress for this frame
+        """
+        state, labels = self._gestures[gesture]
+        
+        # One timestamp for the whole frame
+        now = time.monotonic()
+        
+        # A 0.5 s hold doesn't need a new detection on every frame - submit
+        # one on a stride and reuse the last result in between. Once
+        # triggered, the state only changes when the hand leaves or releases,
+        # so the stride can be longer. The stride only gates submission: a
+        # finished inference is picked up on every frame.
+        self._frame_counter += 1
+        stride = LANDMARK_CACHE_STRIDE if state["triggered"] else INFERENCE_FRAME_STRIDE
+        if self._last_result is not None and self._frame_counter % stride != 0:
+            self._collect_pending()
+            results = self._last_result
+        else:
+            # Detect hands
+            results = self.detect_hands(frame, now)
         
+        pts = None
         gesture_detected = False
-        status_text = "No hand detected"
-        status_color = COLOR_RED
+        label = "no_hand"
+        progress = 0
         
         # Check if hand is detected
-        if results.hand_landmarks and len(results.hand_landmarks) > 0:
-            landmarks = results.hand_landmarks[0]
+        if results is not None and results.hand_landmarks:
+            pts = self.landmarks_to_array(results.hand_landmarks[0])
             
-            # Draw hand landmarks
-            self.draw_landmarks(frame, landmarks)
-            
-            # Detect pinch gesture
-            is_pinching_now = self.detect_pinch(landmarks)
-            
-            if is_pinching_now:
-                # Start timing the pinch
-                if self.pinch_start_time is None:
-                    self.pinch_start_time = time.time()
+            if self.detect_pinch_state(pts)[gesture]:
+                # Start timing the gesture
+                if state["start"] is None:
+                    state["start"] = now
                 
-                # Check if pinch held long enough
-                hold_duration = time.time() - self.pinch_start_time
+                # Check if gesture held long enough
+                hold_duration = now - state["start"]
                 
-                if hold_duration >= GESTURE_HOLD_TIME and not self.gesture_triggered:
+                if hold_duration >= GESTURE_HOLD_TIME and not state["triggered"]:
                     # Gesture completed!
                     gesture_detected = True
-                    self.gesture_triggered = True
-                    status_text = "GESTURE TRIGGERED!"
-                    status_color = COLOR_YELLOW
+                    state["triggered"] = True
+                    self._frame_counter = 0
+                    label = "triggered"
                 else:
                     # Still holding
                     progress = int((hold_duration / GESTURE_HOLD_TIME) * 100)
-                    status_text = f"Pinching... {progress}%"
-                    status_color = COLOR_GREEN
+                    label = "holding"
             else:
-                # Reset if pinch released
-                self.pinch_start_time = None
-                if self.gesture_triggered:
-                    status_text = "Gesture completed - Ready for next"
-                    status_color = COLOR_BLUE
-                else:
-                    status_text = "Hand detected - Make pinch gesture"
-                    status_color = COLOR_GREEN
+                # Reset if gesture released
+                state["start"] = None
+                label = "done" if state["triggered"] else "idle"
         else:
             # No hand detected - reset state
-            self.pinch_start_time = None
-            self.gesture_triggered = False
+            state["start"] = None
+            state["triggered"] = False
+        
+        status_text, status_color = labels[label]
+        if label == "holding":
+            status_text = status_text.format(progress=progress)
+        
+        # Progress bar shown while holding
+        hold_progress = None
+        if state["start"] is not None and not state["triggered"]:
+            hold_progress = min((now - state["start"]) / GESTURE_HOLD_TIME, 1.0)
+        
+        return GestureState(pts, status_text, status_color, hold_progress, gesture_detected)
+    
+    def render(self, frame, state, pending_info=None):
+        """
+        Draw landmarks, status text and progress bar for an inferred frame
+        
+        Args:
+            frame: OpenCV frame (BGR image), annotated in place
+            state: GestureState returned by infer()
+            pending_info: Optional dict with file info to display
+            
+        Returns:
+            np.ndarray: The annotated frame
+        """
+        # Draw hand landmarks
+        if state.pts is not None:
+            if self.show_landmarks:
+                self.draw_landmarks(frame, state.pts)
+            else:
+                self.draw_fingertips(frame, state.pts)
         
         # Draw status text on frame
         cv2.putText(
             frame,
-            status_text,
+            state.status_text,
             (10, 30),
             cv2.FONT_HERSHEY_SIMPLEX,
             1,
-            status_color,
+            state.status_color,
             2,
             cv2.LINE_AA
         )
         
-        # Draw progress bar when pinching
-        if self.pinch_start_time is not None and not self.gesture_triggered:
-            hold_duration = time.time() - self.pinch_start_time
-            progress = min(hold_duration / GESTURE_HOLD_TIME, 1.0)
-            
-            # Progress bar dimensions
-            bar_x = 10
-            bar_y = 50
-            bar_width = 300
-            bar_height = 30
-            
-            # Draw background (gray)
-            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), (100, 100, 100), -1)
-            
-            # Draw progress (green gradient)
-            fill_width = int(bar_width * progress)
-            if fill_width > 0:
-                # Color transitions from yellow to green as progress increases
-                green = int(255 * progress)
-                blue = 0
-                red = int(255 * (1 - progress))
-                cv2.rectangle(frame, (bar_x, bar_y), (bar_x + fill_width, bar_y + bar_height), (blue, green, red), -1)
-            
-            # Draw border
-            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), (255, 255, 255), 2)
+        # Draw pending file info if provided - the text is fixed for a
+        # request, so it is rasterized once and copied onto each frame
+        if pending_info:
+            width = frame.shape[1]
+            if (self._info_key is None or self._info_key[0] is not pending_info
+                    or self._info_key[1] != width):
+                self._info_overlay = render_text_strip(
+                    [
+                        (f"Incoming: {pending_info.get('file_name', 'Unknown')}", RECEIVER_INFO_STRIP_HEIGHT - 60),
+                        (f"From: {pending_info.get('sender_ip', 'Unknown')}", RECEIVER_INFO_STRIP_HEIGHT - 30),
+                    ],
+                    width,
+                    RECEIVER_INFO_STRIP_HEIGHT,
+                    0.7
+                )
+                self._info_key = (pending_info, width)
+            blit_text_strip(frame, self._info_overlay)
+        
+        # Draw progress bar while holding
+        if state.hold_progress is not None:
+            self.draw_progress_bar(frame, state.hold_progress)
+        
+        return frame
+    
+    def process_frame(self, frame):
+        """
+        Process a video frame to detect pinch gesture (for sender)
+        
+        Args:
+            frame: OpenCV frame (BGR image)
             
-            # Draw percentage text on bar
-            percent_text = f"{int(progress * 100)}%"
-            text_size = cv2.getTextSize(percent_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-            text_x = bar_x + (bar_width - text_size[0]) // 2
-            text_y = bar_y + (bar_height + text_size[1]) // 2
-            cv2.putText(frame, percent_text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        return frame, gesture_detected
+        Returns:
+            tuple: (processed_frame, gesture_detected)
+                - processed_frame: Frame with hand landmarks drawn
+                - gesture_detected: True if pinch gesture completed
+        """
+        state = self.infer(frame, PINCH)
+        
+        return self.render(frame, state), state.gesture_detected
     
     def process_frame_open_pinch(self, frame, pending_info=None):
         """
@@ -300,139 +621,44 @@ class GestureDetector:
                 - processed_frame: Frame with hand landmarks drawn
                 - gesture_detected: True if open pinch gesture completed
         """
-        # Convert BGR to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Create MediaPipe Image
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        state = self.infer(frame, OPEN_PINCH)
         
-        # Detect hands
-        results = self.detector.detect(mp_image)
-        
-        gesture_detected = False
-        status_text = "No hand detected - Show open hand"
-        status_color = COLOR_RED
-        
-        # Check if hand is detected
-        if results.hand_landmarks and len(results.hand_landmarks) > 0:
-            landmarks = results.hand_landmarks[0]
-            
-            # Draw hand landmarks
-            self.draw_landmarks(frame, landmarks)
-            
-            # Detect open pinch gesture
-            is_open_pinch_now = self.detect_open_pinch(landmarks)
-            
-            if is_open_pinch_now:
-                # Start timing the open pinch
-                if self.open_pinch_start_time is None:
-                    self.open_pinch_start_time = time.time()
-                
-                # Check if open pinch held long enough
-                hold_duration = time.time() - self.open_pinch_start_time
-                
-                if hold_duration >= GESTURE_HOLD_TIME and not self.open_pinch_triggered:
-                    # Gesture completed!
-                    gesture_detected = True
-                    self.open_pinch_triggered = True
-                    status_text = "ACCEPTING FILE!"
-                    status_color = COLOR_YELLOW
-                else:
-                    # Still holding
-                    progress = int((hold_duration / GESTURE_HOLD_TIME) * 100)
-                    status_text = f"Open pinch... {progress}%"
-                    status_color = COLOR_GREEN
-            else:
-                # Reset if open pinch released
-                self.open_pinch_start_time = None
-                if self.open_pinch_triggered:
-                    status_text = "File accepted!"
-                    status_color = COLOR_BLUE
-                else:
-                    status_text = "Spread thumb & index to accept"
-                    status_color = COLOR_GREEN
-        else:
-            # No hand detected - reset state
-            self.open_pinch_start_time = None
-            self.open_pinch_triggered = False
-        
-        # Draw status text on frame
-        cv2.putText(
-            frame,
-            status_text,
-            (10, 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            status_color,
-            2,
-            cv2.LINE_AA
-        )
-        
-        # Draw pending file info if provided
-        if pending_info:
-            cv2.putText(
-                frame,
-                f"Incoming: {pending_info.get('file_name', 'Unknown')}",
-                (10, frame.shape[0] - 60),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (255, 255, 255),
-                2
-            )
-            cv2.putText(
-                frame,
-                f"From: {pending_info.get('sender_ip', 'Unknown')}",
-                (10, frame.shape[0] - 30),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (255, 255, 255),
-                2
-            )
-        
-        # Draw progress bar when doing open pinch
-        if self.open_pinch_start_time is not None and not self.open_pinch_triggered:
-            hold_duration = time.time() - self.open_pinch_start_time
-            progress = min(hold_duration / GESTURE_HOLD_TIME, 1.0)
-            
-            # Progress bar dimensions
-            bar_x = 10
-            bar_y = 50
-            bar_width = 300
-            bar_height = 30
-            
-            # Draw background (gray)
-            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), (100, 100, 100), -1)
-            
-            # Draw progress (green gradient)
-            fill_width = int(bar_width * progress)
-            if fill_width > 0:
-                green = int(255 * progress)
-                blue = 0
-                red = int(255 * (1 - progress))
-                cv2.rectangle(frame, (bar_x, bar_y), (bar_x + fill_width, bar_y + bar_height), (blue, green, red), -1)
-            
-            # Draw border
-            cv2.rectangle(frame, (bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height), (255, 255, 255), 2)
-            
-            # Draw percentage text
-            percent_text = f"{int(progress * 100)}%"
-            text_size = cv2.getTextSize(percent_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-            text_x = bar_x + (bar_width - text_size[0]) // 2
-            text_y = bar_y + (bar_height + text_size[1]) // 2
-            cv2.putText(frame, percent_text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        return frame, gesture_detected
+        return self.render(frame, state, pending_info), state.gesture_detected
     
     def reset_gesture(self):
         """Reset gesture state to allow new gesture detection"""
-        self.gesture_triggered = False
-        self.pinch_start_time = None
+        self._pinch_state["triggered"] = False
+        self._pinch_state["start"] = None
     
     def reset_open_pinch(self):
         """Reset open pinch state"""
-        self.open_pinch_triggered = False
-        self.open_pinch_start_time = None
+        self._open_pinch_state["triggered"] = False
+        self._open_pinch_state["start"] = None
+    
+    def reset(self):
+        """
+        Clear per-session state so the detector can be reused for the next transfer
+        
+        The MediaPipe graph, worker thread and buffers are kept; timestamps
+        keep increasing, as VIDEO mode requires.
+        """
+        self.reset_gesture()
+        self.reset_open_pinch()
+        
+        # Wait out an in-flight inference (its result is stale) - exception()
+        # blocks like result() but doesn't re-raise
+        if self._pending is not None:
+            self._pending.exception()
+            self._pending = None
+        
+        self._last_result = None
+        self._last_result_time = 0.0
+        self._frame_counter = 0
+        self._info_key = None
+        self._info_overlay = None
     
     def cleanup(self):
         """Release MediaPipe resources"""
+        # Let any in-flight inference finish before closing the detector
+        self._pool.shutdown(wait=True)
         self.detector.close()
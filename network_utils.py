@@ -7,9 +7,11 @@ import socket
 import threading
 import os
 import json
-import time
-from config import UDP_PORT, TCP_PORT, BROADCAST_INTERVAL, BUFFER_SIZE
-from config import DISCOVERY_TIMEOUT, RECEIVED_FILES_DIR
+import struct
+import selectors
+from config import UDP_PORT, TCP_PORT, BROADCAST_INTERVAL, BUFFER_SIZE, SOCKET_BUFFER_SIZE
+from config import WRITE_BUFFER_SIZE
+from config import DISCOVERY_TIMEOUT, RECEIVED_FILES_DIR, MAX_FILE_SIZE
 
 
 def get_local_ip():
@@ -32,12 +34,315 @@ def get_local_ip():
         return "127.0.0.1"
 
 
+def recv_exact(sock, n):
+    """
+    Receive exactly n bytes from a socket.
+    recv() may return fewer bytes than requested, so keep reading into a
+    preallocated buffer until it is full.
+    
+    Args:
+        sock: Connected socket
+        n: Number of bytes to read
+        
+    Returns:
+        bytes: Exactly n bytes
+        
+    Raises:
+        ConnectionError: If the peer closes the connection first
+    """
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if not k:
+            raise ConnectionError(f"Connection closed after {got} of {n} bytes")
+        got += k
+    return bytes(buf)
+
+
+def wait_readable(sock, poll_interval=0.1, stop_event=None):
+    """
+    Block until a socket has data (or EOF) in short select() slices.
+    A single blocking recv() can't be interrupted by Ctrl+C on Windows;
+    waking every poll_interval lets KeyboardInterrupt through and lets a
+    stop_event end the wait.
+    
+    Args:
+        sock: Connected socket
+        poll_interval: Seconds per select() call
+        stop_event: Optional threading.Event that cancels the wait
+        
+    Returns:
+        bool: True if readable, False if stop_event was set
+    """
+    with selectors.DefaultSelector() as sel:
+        sel.register(sock, selectors.EVENT_READ)
+        while not sel.select(poll_interval):
+            if stop_event is not None and stop_event.is_set():
+                return False
+    return True
+
+
+# Handshake message: type (uint8) + file size (uint64) + UTF-8 file name
+# length (uint16), then the name. Sent as OPEN_CAMERA by the sender and
+# answered with ACCEPTED/DECLINED (empty name, size 0) by the receiver.
+MESSAGE_HEADER = struct.Struct('>BQH')
+MSG_OPEN_CAMERA = 1
+MSG_ACCEPTED = 2
+MSG_DECLINED = 3
+
+
+def pack_message(msg_type, file_name="", file_size=0):
+    """
+    Build a handshake message
+    
+    Args:
+        msg_type: MSG_OPEN_CAMERA, MSG_ACCEPTED or MSG_DECLINED
+        file_name: Name of the offered file (OPEN_CAMERA only)
+        file_size: Size of the offered file in bytes (OPEN_CAMERA only)
+        
+    Returns:
+        bytes: Packed header followed by the encoded file name
+    """
+    name_bytes = file_name.encode('utf-8')
+    return MESSAGE_HEADER.pack(msg_type, file_size, len(name_bytes)) + name_bytes
+
+
+def recv_message(sock):
+    """
+    Receive a message built by pack_message
+    
+    Args:
+        sock: Connected socket
+        
+    Returns:
+        tuple: (msg_type, file_name, file_size)
+        
+    Raises:
+        ConnectionError: If the peer closes the connection first
+    """
+    msg_type, file_size, name_len = MESSAGE_HEADER.unpack(recv_exact(sock, MESSAGE_HEADER.size))
+    file_name = recv_exact(sock, name_len).decode('utf-8') if name_len else ""
+    return msg_type, file_name, file_size
+
+
+# File header: file size (uint64) + UTF-8 file name length (uint16), then the name
+FILE_HEADER = struct.Struct('>QH')
+
+
+def pack_file_header(file_name, file_size):
+    """
+    Build the header sent before file data
+    
+    Args:
+        file_name: Name of the file
+        file_size: Size of the file in bytes
+        
+    Returns:
+        bytes: Packed header followed by the encoded file name
+    """
+    name_bytes = file_name.encode('utf-8')
+    return FILE_HEADER.pack(file_size, len(name_bytes)) + name_bytes
+
+
+def recv_file_header(sock):
+    """
+    Receive the header sent by pack_file_header
+    
+    Args:
+        sock: Connected socket
+        
+    Returns:
+        tuple: (file_name, file_size)
+        
+    Raises:
+        ValueError: If the announced size exceeds MAX_FILE_SIZE
+    """
+    file_size, name_len = FILE_HEADER.unpack(recv_exact(sock, FILE_HEADER.size))
+    if file_size > MAX_FILE_SIZE:
+        raise ValueError(f"File too large ({file_size} bytes, limit {MAX_FILE_SIZE})")
+    file_name = recv_exact(sock, name_len).decode('utf-8')
+    return file_name, file_size
+
+
+def open_unique(save_dir, file_name, buffering=-1):
+    """
+    Create a new file for writing without overwriting an existing one.
+    Uses O_CREAT | O_EXCL so each attempt is a single atomic syscall;
+    on a name clash "_1", "_2", ... is appended before the extension.
+    
+    Args:
+        save_dir: Directory to create the file in
+        file_name: Desired file name
+        buffering: Passed to os.fdopen (0 = unbuffered, for callers that
+            batch their own writes)
+        
+    Returns:
+        tuple: (file object opened 'wb', save_path)
+    """
+    name, ext = os.path.splitext(file_name)
+    save_path = os.path.join(save_dir, file_name)
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0)
+    
+    counter = 1
+    while True:
+        try:
+            fd = os.open(save_path, flags, 0o644)
+            return os.fdopen(fd, 'wb', buffering=buffering), save_path
+        except FileExistsError:
+            save_path = os.path.join(save_dir, f"{name}_{counter}{ext}")
+            counter += 1
+
+
+def preallocate(f, size):
+    """
+    Reserve disk space for a file that is about to be written.
+    Allocating the full size up front lets the filesystem lay the file out
+    contiguously instead of extending it chunk by chunk. No-op where
+    posix_fallocate isn't available (Windows, macOS) or fails, and for sizes
+    above MAX_FILE_SIZE - the size comes from the peer, and must not be able
+    to reserve the whole disk (or, where glibc emulates fallocate by writing
+    every block, stall the receiver).
+    
+    Args:
+        f: File object opened for writing
+        size: Expected final size in bytes
+    """
+    if 0 < size <= MAX_FILE_SIZE and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+        except OSError:
+            pass
+
+
+def recv_to_file(sock, f, file_size, label="Progress"):
+    """
+    Stream file_size bytes from a socket into a file.
+    recv_into fills one WRITE_BUFFER_SIZE bytearray in place and it is only
+    written out when full, so many small network reads become a few large
+    disk writes. Open f with buffering=0 - this is its buffer.
+    
+    Args:
+        sock: Connected TCP socket positioned at the start of the file data
+        f: File object opened for writing
+        file_size: Number of bytes to receive
+        label: Prefix for the progress line
+        
+    Returns:
+        int: Bytes received (less than file_size if the peer closed early)
+    """
+    buf = bytearray(WRITE_BUFFER_SIZE)
+    view = memoryview(buf)
+    
+    # Report progress at most ~100 times instead of once per chunk
+    report_step = max(1, file_size // 100)
+    next_report = report_step
+    
+    received_bytes = 0
+    filled = 0
+    while received_bytes < file_size:
+        n = sock.recv_into(view[filled:filled + min(WRITE_BUFFER_SIZE - filled, file_size - received_bytes)])
+        if not n:
+            break
+        filled += n
+        received_bytes += n
+        
+        if filled == WRITE_BUFFER_SIZE:
+            _write_all(f, view[:filled])
+            filled = 0
+        
+        if received_bytes >= next_report or received_bytes == file_size:
+            progress = (received_bytes / file_size) * 100
+            print(f"\r[RECEIVE] {label}: {progress:.1f}%", end='')
+            next_report = received_bytes + report_step
+    
+    if filled:
+        _write_all(f, view[:filled])
+    return received_bytes
+
+
+def save_incoming_file(sock, save_dir, file_name, file_size, label="Progress"):
+    """
+    Receive file data from a socket into a new file in save_dir.
+    The file is created with open_unique (duplicates get a numeric suffix),
+    preallocated, and filled by recv_to_file. An incomplete file - peer
+    closed early, error, or shutdown - is deleted rather than left behind
+    truncated.
+    
+    Args:
+        sock: Connected TCP socket positioned at the start of the file data
+        save_dir: Directory to save the file in (created if missing)
+        file_name: Name to save under
+        file_size: Number of bytes to receive
+        label: Prefix for the progress line
+        
+    Returns:
+        str: Path of the saved file, or None if the transfer failed
+    """
+    try:
+        os.makedirs(save_dir, exist_ok=True)
+        # Unbuffered because recv_to_file batches writes through its own buffer
+        f, save_path = open_unique(save_dir, file_name, buffering=0)
+    except Exception as e:
+        print(f"\n[RECEIVE ERROR] {e}")
+        return None
+    
+    received_bytes = 0
+    try:
+        with f:
+            preallocate(f, file_size)
+            
+            received_bytes = recv_to_file(sock, f, file_size, label=label)
+    except Exception as e:
+        print(f"\n[RECEIVE ERROR] {e}")
+    
+    if received_bytes < file_size:
+        try:
+            os.remove(save_path)
+        except OSError:
+            pass
+        print(f"\n[RECEIVE ERROR] Transfer incomplete ({received_bytes} of {file_size} bytes) - discarded")
+        return None
+    
+    return save_path
+
+
+def _write_all(f, data):
+    """Write a memoryview fully; an unbuffered file may accept only part of it"""
+    while data:
+        data = data[f.write(data):]
+
+
+def tune_transfer_socket(sock):
+    """
+    Configure a TCP socket for file transfer.
+    Enlarges the kernel send/receive buffers so a fast LAN isn't limited by
+    the default window, and disables Nagle so the small metadata/handshake
+    messages go out immediately. Call before connect()/listen() so accepted
+    sockets inherit the settings and the window scale is negotiated.
+    
+    Args:
+        sock: TCP socket
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
 class DeviceDiscovery:
     """Handles UDP broadcast for device discovery"""
     
     def __init__(self):
-        self.is_broadcasting = False
+        # Set to stop the broadcast loop; wait() on it doubles as the interval sleep
+        self._stop_event = threading.Event()
+        self._stop_event.set()
         self.broadcast_thread = None
+    
+    @property
+    def is_broadcasting(self):
+        """True while the broadcast loop is running"""
+        return not self._stop_event.is_set()
         
     def start_broadcast(self, device_name="Receiver"):
         """
@@ -46,7 +351,7 @@ class DeviceDiscovery:
         Args:
             device_name: Name to identify this device
         """
-        self.is_broadcasting = True
+        self._stop_event.clear()
         self.broadcast_thread = threading.Thread(
             target=self._broadcast_loop,
             args=(device_name,),
@@ -76,10 +381,13 @@ class DeviceDiscovery:
             "port": TCP_PORT
         }).encode()
         
-        while self.is_broadcasting:
+        broadcast_addr = ('<broadcast>', UDP_PORT)
+        
+        while not self._stop_event.is_set():
             try:
-                sock.sendto(message, ('<broadcast>', UDP_PORT))
-                time.sleep(BROADCAST_INTERVAL)
+                sock.sendto(message, broadcast_addr)
+                # Returns immediately when stop_broadcast() is called
+                self._stop_event.wait(BROADCAST_INTERVAL)
             except Exception as e:
                 print(f"[BROADCAST ERROR] {e}")
                 break
@@ -88,7 +396,7 @@ class DeviceDiscovery:
     
     def stop_broadcast(self):
         """Stop broadcasting"""
-        self.is_broadcasting = False
+        self._stop_event.set()
         if self.broadcast_thread:
             self.broadcast_thread.join(timeout=3)
         print("[BROADCAST] Stopped broadcasting")
@@ -109,13 +417,19 @@ class DeviceDiscovery:
         # Create UDP socket for listening
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Let several discoverers on one host share the port (not on Windows)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         sock.bind(('', UDP_PORT))
         sock.settimeout(timeout)
         
+        # One datagram buffer reused for every packet
+        buf = bytearray(1024)
+        
         try:
             while True:
-                data, addr = sock.recvfrom(1024)
-                message = json.loads(data.decode())
+                nbytes, addr = sock.recvfrom_into(buf)
+                message = json.loads(buf[:nbytes].decode())
                 
                 if message.get("type") == "RECEIVER_BROADCAST":
                     receiver_ip = message.get("ip")
@@ -156,55 +470,106 @@ class FileTransfer:
             print(f"[SEND ERROR] File not found: {file_path}")
             return False
         
-        file_size = os.path.getsize(file_path)
-        file_name = os.path.basename(file_path)
-        
         print(f"[SEND] Connecting to {receiver_ip}:{receiver_port}...")
         
         try:
             # Create TCP socket
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            tune_transfer_socket(sock)
             sock.connect((receiver_ip, receiver_port))
+        except Exception as e:
+            print(f"\n[SEND ERROR] {e}")
+            return False
+        
+        return FileTransfer.send_file_on(sock, file_path)
+    
+    @staticmethod
+    def send_file_on(sock, file_path):
+        """
+        Send a file over an already connected socket
+        
+        Writes the binary file header followed by the file data, so the
+        socket that carried the accept handshake can carry the file too.
+        
+        Args:
+            sock: Connected TCP socket (closed when done)
+            file_path: Path to file to send
             
-            # Send file metadata
-            metadata = json.dumps({
-                "file_name": file_name,
-                "file_size": file_size
-            }).encode()
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            file_size = os.path.getsize(file_path)
+            file_name = os.path.basename(file_path)
             
-            sock.sendall(len(metadata).to_bytes(4, 'big'))
-            sock.sendall(metadata)
+            # Send file metadata
+            sock.sendall(pack_file_header(file_name, file_size))
             
             # Send file data
             print(f"[SEND] Sending {file_name} ({file_size} bytes)...")
             
+            # sendfile() copies straight from the page cache to the socket
+            # (os.sendfile where available, read/send fallback elsewhere).
+            # Send in ~1% slices so progress can still be reported.
+            report_step = max(BUFFER_SIZE, file_size // 100)
+            
             with open(file_path, 'rb') as f:
                 sent_bytes = 0
-                while True:
-                    chunk = f.read(BUFFER_SIZE)
-                    if not chunk:
+                while sent_bytes < file_size:
+                    sent = sock.sendfile(f, sent_bytes, min(report_step, file_size - sent_bytes))
+                    if not sent:
                         break
-                    
-                    sock.sendall(chunk)
-                    sent_bytes += len(chunk)
+                    sent_bytes += sent
                     
                     # Show progress
                     progress = (sent_bytes / file_size) * 100
                     print(f"\r[SEND] Progress: {progress:.1f}%", end='')
             
             print(f"\n[SEND] File sent successfully!")
-            sock.close()
             return True
             
         except Exception as e:
             print(f"\n[SEND ERROR] {e}")
             return False
+        finally:
+            sock.close()
+    
+    @staticmethod
+    def _receive_one(client_sock, save_dir):
+        """
+        Receive a single file from an accepted connection
+        
+        Args:
+            client_sock: Accepted TCP socket (closed when done)
+            save_dir: Directory to save the file in
+        """
+        try:
+            # Receive metadata
+            file_name, file_size = recv_file_header(client_sock)
+            
+            print(f"[RECEIVE] Receiving {file_name} ({file_size} bytes)...")
+            
+            # Receive file data
+            save_path = save_incoming_file(client_sock, save_dir, file_name, file_size, label=file_name)
+        except Exception as e:
+            print(f"\n[RECEIVE ERROR] {e}")
+            return
+        finally:
+            client_sock.close()
+        
+        if save_path:
+            print(f"\n[RECEIVE] File saved to: {save_path}")
+            print(f"[RECEIVE] Waiting for next file...")
     
     @staticmethod
     def receive_file(save_dir=RECEIVED_FILES_DIR):
         """
         Start TCP server to receive files
         
+        Each transfer runs on its own thread. On Ctrl+C the in-flight
+        transfers are cut off and joined, so their partial files are
+        removed before this returns.
+        
         Args:
             save_dir: Directory to save received files
         """
@@ -214,55 +579,29 @@ class FileTransfer:
         # Create TCP server socket
         server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        tune_transfer_socket(server_sock)
         server_sock.bind(('', TCP_PORT))
         server_sock.listen(5)
         
         print(f"[RECEIVE] Listening for file transfers on port {TCP_PORT}...")
         
+        workers = []  # (thread, client_sock) per transfer
+        
         while True:
             try:
                 # Accept connection
                 client_sock, client_addr = server_sock.accept()
                 print(f"\n[RECEIVE] Connection from {client_addr[0]}")
                 
-                # Receive metadata length
-                metadata_len = int.from_bytes(client_sock.recv(4), 'big')
-                
-                # Receive metadata
-                metadata = json.loads(client_sock.recv(metadata_len).decode())
-                file_name = metadata["file_name"]
-                file_size = metadata["file_size"]
-                
-                print(f"[RECEIVE] Receiving {file_name} ({file_size} bytes)...")
-                
-                # Receive file data
-                save_path = os.path.join(save_dir, file_name)
-                
-                # Handle duplicate filenames
-                counter = 1
-                while os.path.exists(save_path):
-                    name, ext = os.path.splitext(file_name)
-                    save_path = os.path.join(save_dir, f"{name}_{counter}{ext}")
-                    counter += 1
-                
-                with open(save_path, 'wb') as f:
-                    received_bytes = 0
-                    while received_bytes < file_size:
-                        chunk = client_sock.recv(min(BUFFER_SIZE, file_size - received_bytes))
-                        if not chunk:
-                            break
-                        
-                        f.write(chunk)
-                        received_bytes += len(chunk)
-                        
-                        # Show progress
-                        progress = (received_bytes / file_size) * 100
-                        print(f"\r[RECEIVE] Progress: {progress:.1f}%", end='')
-                
-                print(f"\n[RECEIVE] File saved to: {save_path}")
-                print(f"[RECEIVE] Waiting for next file...")
-                
-                client_sock.close()
+                # Each transfer gets its own thread so a slow sender never
+                # blocks the accept loop for the next one
+                worker = threading.Thread(
+                    target=FileTransfer._receive_one,
+                    args=(client_sock, save_dir)
+                )
+                worker.start()
+                workers = [w for w in workers if w[0].is_alive()]
+                workers.append((worker, client_sock))
                 
             except KeyboardInterrupt:
                 print("\n[RECEIVE] Shutting down...")
@@ -272,3 +611,13 @@ class FileTransfer:
                 continue
         
         server_sock.close()
+        
+        # Unblock in-flight recv()s, then wait for the workers to clean up
+        for worker, client_sock in workers:
+            if worker.is_alive():
+                try:
+                    client_sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        for worker, _ in workers:
+            worker.join()
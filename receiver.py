@@ -5,16 +5,16 @@ Opens camera when sender signals, waits for open pinch gesture to accept file
 
 import sys
 import socket
-import json
-import os
 import cv2
 import time
-import platform
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from gesture_detector import GestureDetector
-from network_utils import DeviceDiscovery, get_local_ip
-from config import RECEIVED_FILES_DIR, TCP_PORT, BUFFER_SIZE
-from config import CAMERA_INDEX, CAMERA_WIDTH, CAMERA_HEIGHT
+from camera_utils import CameraReader, open_camera, warm_up, mirror, poll_key
+from network_utils import DeviceDiscovery, get_local_ip, tune_transfer_socket
+from network_utils import pack_message, recv_message, MSG_OPEN_CAMERA, MSG_ACCEPTED, MSG_DECLINED
+from network_utils import recv_file_header, save_incoming_file
+from config import RECEIVED_FILES_DIR, TCP_PORT, MAX_FILE_SIZE
 
 
 class FileReceiver:
@@ -26,6 +26,13 @@ class FileReceiver:
         self.gesture_detector = None
         self.server_sock = None  # Main server socket
         
+        # Handshake and gesture prompt stay on the main thread (HighGUI and
+        # Ctrl+C need it); only the accepted file transfer goes to a worker,
+        # so accept() keeps running during a long transfer
+        self._pool = ThreadPoolExecutor(max_workers=4)
+        self._active_socks = set()  # Sockets of transfers in flight, for shutdown
+        self._active_lock = threading.Lock()
+        
     def get_local_ip(self):
         """Get local IP address"""
         return get_local_ip()
@@ -36,69 +43,59 @@ class FileReceiver:
         print("OPEN CAMERA FOR GESTURE")
         print("="*60)
         
-        # Wait for sender camera to fully release (important for EXE/same machine)
-        print("\nWaiting for sender camera to release...")
-        for i in range(3, 0, -1):
-            print(f"  Opening in {i}...")
-            time.sleep(1)
-        
-        print("Initializing MediaPipe...")
-        # Initialize gesture detector
-        try:
-            self.gesture_detector = GestureDetector()
-            print("✓ MediaPipe initialized")
-        except Exception as e:
-            print(f"✗ MediaPipe init failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
+        # Initialize gesture detector on first use, then keep it - model load
+        # and graph setup would otherwise repeat for every transfer
+        if self.gesture_detector is None:
+            print("Initializing MediaPipe...")
+            try:
+                # Only the fingertips matter for the open pinch - skip the full skeleton
+                self.gesture_detector = GestureDetector(show_landmarks=False)
+                print("✓ MediaPipe initialized")
+            except Exception as e:
+                print(f"✗ MediaPipe init failed: {e}")
+                import traceback
+                traceback.print_exc()
+                return False
             
         print("Starting camera...")
         
-        # Open camera with retry
+        # Open camera with retry - back off from 50 ms up to 1 s so a camera
+        # that frees up quickly (or is free already) opens right away, while
+        # the same-machine case still waits up to ~10 s for the sender
         cap = None
-        for attempt in range(10):  # Increase retries to 10
+        delay = 0.05
+        deadline = time.monotonic() + 10
+        attempt = 0
+        while True:
+            attempt += 1
             try:
-                if platform.system() == 'Windows':
-                    cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
-                else:
-                    cap = cv2.VideoCapture(CAMERA_INDEX)
-                
-                cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
-                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
-                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                cap = open_camera()
                 
                 if cap.isOpened():
                     # Try to read a frame to confirm it works
                     ret, _ = cap.read()
                     if ret:
-                        print(f"✓ Camera opened on attempt {attempt + 1}")
+                        print(f"✓ Camera opened on attempt {attempt}")
                         break
-                    else:
-                        print(f"  Camera opened but failed to read frame...")
-                        cap.release()
-                else:
-                    print(f"  Retry {attempt + 1}/10 - camera not ready...")
+                    cap.release()
                 
-                time.sleep(1)
+                print(f"  Retry {attempt} - camera not ready (sender may still hold it)...")
             except Exception as e:
-                print(f"  Camera error attempt {attempt+1}: {e}")
-                time.sleep(1)
+                print(f"  Camera error attempt {attempt}: {e}")
+            
+            if time.monotonic() + delay > deadline:
+                break
+            time.sleep(delay)
+            delay = min(1.0, delay * 2)
         
         if not cap or not cap.isOpened():
             print("✗ Error: Could not open camera after retries")
             print("  Check if sender camera is truly closed")
-            try:
-                self.gesture_detector.cleanup()
-            except:
-                pass
             return False
         
-        # Warmup
+        # Warmup - until exposure settles, at most 200 ms
         print("Warming up camera...")
-        for _ in range(5):
-            cap.read()
-            time.sleep(0.05)
+        warm_up(cap)
         
         print("✓ Camera started")
         print(f"\nIncoming file: {file_info.get('file_name', 'Unknown')}")
@@ -107,26 +104,30 @@ class FileReceiver:
         print("Press 'q' to DECLINE")
         
         window_name = "Receiver - Open Pinch to Accept"
-        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL | cv2.WINDOW_GUI_NORMAL)
+        
+        # Capture on a background thread so each loop iteration gets the freshest frame
+        reader = CameraReader(cap)
+        reader.start()
         
         gesture_accepted = False
         
         try:
             consecutive_failures = 0
             max_failures = 30
+            mirrored = None  # Reused flip buffer
             
             while True:
-                ret, frame = cap.read()
+                ret, frame = reader.read_latest()
                 if not ret:
                     consecutive_failures += 1
                     if consecutive_failures >= max_failures:
                         print("✗ Camera read failed")
                         break
-                    time.sleep(0.033)
                     continue
                 
                 consecutive_failures = 0
-                frame = cv2.flip(frame, 1)
+                frame = mirrored = mirror(frame, mirrored)
                 
                 # Process for open pinch gesture
                 processed_frame, gesture_detected = self.gesture_detector.process_frame_open_pinch(
@@ -157,7 +158,7 @@ class FileReceiver:
                     cv2.waitKey(1000)
                     break
                 
-                key = cv2.waitKey(1) & 0xFF
+                key = poll_key()
                 if key == ord('q'):
                     print("\nFile declined by user")
                     break
@@ -167,10 +168,12 @@ class FileReceiver:
         finally:
             # Close camera
             print("Closing receiver camera...")
-            cap.release()
+            if reader.stop():
+                cap.release()
+            else:
+                print("  Capture thread did not stop - leaving camera to process exit")
             cv2.destroyAllWindows()
-            self.gesture_detector.cleanup()
-            self.gesture_detector = None
+            self.gesture_detector.reset()
             print("✓ Receiver camera closed")
         
         return gesture_accepted
@@ -181,60 +184,94 @@ class FileReceiver:
         print("RECEIVING FILE")
         print("="*60)
         
-        # Create save directory
-        os.makedirs(RECEIVED_FILES_DIR, exist_ok=True)
-        
         file_name = file_info.get("file_name", "unknown_file")
         file_size = file_info.get("file_size", 0)
         
         print(f"[RECEIVE] Receiving {file_name} ({file_size} bytes)...")
         
-        # Save file
-        save_path = os.path.join(RECEIVED_FILES_DIR, file_name)
-        counter = 1
-        while os.path.exists(save_path):
-            name, ext = os.path.splitext(file_name)
-            save_path = os.path.join(RECEIVED_FILES_DIR, f"{name}_{counter}{ext}")
-            counter += 1
+        save_path = save_incoming_file(client_sock, RECEIVED_FILES_DIR, file_name, file_size)
+        if not save_path:
+            return False
         
+        print(f"\n[RECEIVE] ✓ File saved to: {save_path}")
+        return True
+    
+    def receive_transfer(self, client_sock, file_info):
+        """
+        Receive the file that follows an ACCEPTED response (runs on a worker)
+        
+        Args:
+            client_sock: Connection the handshake ran on (closed when done)
+            file_info: Dict from the accepted OPEN_CAMERA message
+        """
+        print("\nWaiting for file data...")
         try:
-            with open(save_path, 'wb') as f:
-                received_bytes = 0
-                while received_bytes < file_size:
-                    chunk = client_sock.recv(min(BUFFER_SIZE, file_size - received_bytes))
-                    if not chunk:
-                        break
-                    f.write(chunk)
-                    received_bytes += len(chunk)
-                    progress = (received_bytes / file_size) * 100
-                    print(f"\r[RECEIVE] Progress: {progress:.1f}%", end='')
+            client_sock.settimeout(30)
+            
+            # Receive metadata - it must describe the file the user accepted,
+            # not whatever the sender decides to send after the gesture
+            file_name, file_size = recv_file_header(client_sock)
+            if (file_name, file_size) != (file_info["file_name"], file_info["file_size"]):
+                print(f"[RECEIVE ERROR] Sender sent {file_name} ({file_size} bytes) instead of the accepted "
+                      f"{file_info['file_name']} ({file_info['file_size']} bytes) - rejected")
+                return
+            
+            # Receive file
+            client_sock.settimeout(None)
+            self.receive_file_from_socket(client_sock, file_info)
             
-            print(f"\n[RECEIVE] ✓ File saved to: {save_path}")
-            return True
+        except socket.timeout:
+            print("[RECEIVE] Timeout waiting for file data")
         except Exception as e:
-            print(f"\n[RECEIVE ERROR] {e}")
-            return False
+            print(f"[RECEIVE ERROR] {e}")
+        finally:
+            with self._active_lock:
+                self._active_socks.discard(client_sock)
+            client_sock.close()
+    
+    def _abort_transfers(self):
+        """Cut off in-flight transfers so their workers finish promptly"""
+        with self._active_lock:
+            socks = list(self._active_socks)
+        for sock in socks:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
     
     def handle_connection(self, client_sock, client_addr):
-        """Handle incoming connection from sender"""
+        """
+        Handle incoming connection from sender
+        
+        Protocol, all on one connection: OPEN_CAMERA message -> ACCEPTED or
+        DECLINED message (see network_utils.pack_message) -> if accepted,
+        the binary file header followed by the file data.
+        
+        Runs on the main thread, one sender at a time, since the gesture
+        prompt owns the camera and the HighGUI window; the file data itself
+        is handed to receive_transfer() on the worker pool.
+        """
         try:
-            # Receive signal length
+            # Receive signal
             client_sock.settimeout(10)
-            signal_len_data = client_sock.recv(4)
-            if not signal_len_data:
+            try:
+                msg_type, file_name, file_size = recv_message(client_sock)
+            except ConnectionError:
                 client_sock.close()
                 return
-            signal_len = int.from_bytes(signal_len_data, 'big')
-            
-            # Receive signal
-            signal_data = client_sock.recv(signal_len)
-            signal = json.loads(signal_data.decode())
             
-            if signal.get("type") == "OPEN_CAMERA":
+            if msg_type == MSG_OPEN_CAMERA and file_size > MAX_FILE_SIZE:
+                # Don't even open the camera for an offer we'd refuse
+                print(f"\n[INCOMING] Rejected {file_name} from {client_addr[0]}: "
+                      f"{file_size / (1024*1024):.2f} MB exceeds the {MAX_FILE_SIZE / (1024*1024):.0f} MB limit")
+                client_sock.sendall(pack_message(MSG_DECLINED))
+                client_sock.close()
+                
+            elif msg_type == MSG_OPEN_CAMERA:
                 # Sender wants us to accept file with gesture
                 file_info = {
-                    "file_name": signal.get("file_name", "Unknown"),
-                    "file_size": signal.get("file_size", 0),
+                    "file_name": file_name or "Unknown",
+                    "file_size": file_size,
                     "sender_ip": client_addr[0]
                 }
                 
@@ -246,44 +283,20 @@ class FileReceiver:
                 accepted = self.wait_for_open_pinch_gesture(file_info)
                 
                 # Send response to sender
-                if accepted:
-                    response = json.dumps({"type": "ACCEPTED"}).encode()
-                else:
-                    response = json.dumps({"type": "DECLINED"}).encode()
-                
-                client_sock.sendall(len(response).to_bytes(4, 'big'))
-                client_sock.sendall(response)
-                client_sock.close()
+                client_sock.sendall(pack_message(MSG_ACCEPTED if accepted else MSG_DECLINED))
                 
                 if accepted:
-                    # Wait for sender to connect again with file data
-                    print("\nWaiting for file data...")
-                    try:
-                        self.server_sock.settimeout(30)
-                        file_sock, file_addr = self.server_sock.accept()
-                        print(f"[RECEIVE] Connection from {file_addr[0]}")
-                        
-                        # Receive metadata
-                        metadata_len = int.from_bytes(file_sock.recv(4), 'big')
-                        metadata = json.loads(file_sock.recv(metadata_len).decode())
-                        
-                        file_info["file_name"] = metadata["file_name"]
-                        file_info["file_size"] = metadata["file_size"]
-                        
-                        # Receive file
-                        self.receive_file_from_socket(file_sock, file_info)
-                        file_sock.close()
-                        
-                    except socket.timeout:
-                        print("[RECEIVE] Timeout waiting for file data")
-                    except Exception as e:
-                        print(f"[RECEIVE ERROR] {e}")
-                    finally:
-                        self.server_sock.settimeout(None)
+                    # The file follows on this same connection; receive it on
+                    # a worker so the next sender can connect meanwhile
+                    with self._active_lock:
+                        self._active_socks.add(client_sock)
+                    self._pool.submit(self.receive_transfer, client_sock, file_info)
+                else:
+                    client_sock.close()
                         
             else:
                 # Unknown signal type
-                print(f"[WARNING] Unknown signal type: {signal.get('type')}")
+                print(f"[WARNING] Unknown signal type: {msg_type}")
                 client_sock.close()
                 
         except Exception as e:
@@ -294,6 +307,10 @@ class FileReceiver:
                 client_sock.close()
             except:
                 pass
+        
+        print("\n" + "="*60)
+        print("WAITING FOR NEXT FILE...")
+        print("="*60)
     
     def run(self):
         """Main application flow"""
@@ -318,6 +335,7 @@ class FileReceiver:
         # Create main server socket
         self.server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        tune_transfer_socket(self.server_sock)
         self.server_sock.bind(('', TCP_PORT))
         self.server_sock.listen(5)
         
@@ -332,19 +350,21 @@ class FileReceiver:
                 client_sock, client_addr = self.server_sock.accept()
                 print(f"\n[CONNECTION] From {client_addr[0]}")
                 
-                # Handle connection directly (not in thread for clarity)
+                # Gesture prompt runs here; an accepted transfer continues on a worker
                 self.handle_connection(client_sock, client_addr)
                 
-                print("\n" + "="*60)
-                print("WAITING FOR NEXT FILE...")
-                print("="*60)
-                
         except KeyboardInterrupt:
             print("\n\n" + "="*60)
             print("SHUTTING DOWN")
             print("="*60)
             self.discovery.stop_broadcast()
             self.server_sock.close()
+            # Stop transfers and wait for their workers (partial files are
+            # removed) before the detector is closed and the process exits
+            self._abort_transfers()
+            self._pool.shutdown(wait=True)
+            if self.gesture_detector is not None:
+                self.gesture_detector.cleanup()
             print("✓ Receiver closed")
         
         print("\n" + "="*60)
@@ -8,12 +8,15 @@ import cv2
 import os
 import sys
 import socket
-import json
-import time
 from tkinter import Tk, filedialog
-from gesture_detector import GestureDetector
-from network_utils import DeviceDiscovery, FileTransfer
-from config import CAMERA_INDEX, CAMERA_WIDTH, CAMERA_HEIGHT, TCP_PORT
+from gesture_detector import GestureDetector, render_text_strip, blit_text_strip
+from camera_utils import CameraReader, open_camera, warm_up, mirror, poll_key
+from network_utils import DeviceDiscovery, FileTransfer, get_local_ip, tune_transfer_socket
+from network_utils import pack_message, recv_message, wait_readable, MSG_OPEN_CAMERA, MSG_ACCEPTED
+from config import TCP_PORT
+
+# Height of the bottom strip holding the file/receiver labels
+SENDER_INFO_STRIP_HEIGHT = 60
 
 
 class FileSender:
@@ -22,9 +25,13 @@ class FileSender:
     def __init__(self):
         self.gesture_detector = GestureDetector()
         self.selected_file = None
+        self.file_name = None  # Basename and size of selected_file, stat'ed once
+        self.file_size = 0
         self.receiver_ip = None
         self.receiver_port = None
         self.file_sent = False
+        self.transfer_sock = None  # Handshake socket kept open for the file data once accepted
+        self._tk_root = None  # Hidden Tk root, created once for every file dialog
         
     def select_file(self):
         """Open file dialog to select file for transfer"""
@@ -32,30 +39,39 @@ class FileSender:
         print("FILE SELECTION")
         print("="*60)
         
-        # Hide the root Tkinter window
-        root = Tk()
-        root.withdraw()
-        root.attributes('-topmost', True)
+        # Hide the root Tkinter window - kept for later transfers so the Tcl
+        # interpreter only starts once
+        if self._tk_root is None:
+            self._tk_root = Tk()
+            self._tk_root.withdraw()
+            self._tk_root.attributes('-topmost', True)
         
         # Open file dialog
         file_path = filedialog.askopenfilename(
+            parent=self._tk_root,
             title="Select file to transfer",
             filetypes=[("All files", "*.*")]
         )
         
-        root.destroy()
-        
         if file_path:
             self.selected_file = file_path
-            file_size = os.path.getsize(file_path) / (1024 * 1024)  # MB
-            print(f"✓ Selected: {os.path.basename(file_path)}")
-            print(f"  Size: {file_size:.2f} MB")
+            self.file_name = os.path.basename(file_path)
+            self.file_size = os.stat(file_path).st_size
+            print(f"✓ Selected: {self.file_name}")
+            print(f"  Size: {self.file_size / (1024 * 1024):.2f} MB")
             print(f"  Path: {file_path}")
             return True
         else:
             print("✗ No file selected")
             return False
     
+    def close(self):
+        """Release the MediaPipe detector and the Tk root"""
+        self.gesture_detector.cleanup()
+        if self._tk_root is not None:
+            self._tk_root.destroy()
+            self._tk_root = None
+    
     def get_receiver_ip(self):
         """Get receiver IP address - try discovery first, then ask user"""
         print("\n" + "="*60)
@@ -68,16 +84,9 @@ class FileSender:
         
         if self.receiver_ip:
             # Check if same machine
-            try:
-                s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                s.connect(("8.8.8.8", 80))
-                local_ip = s.getsockname()[0]
-                s.close()
-                if self.receiver_ip == local_ip:
-                    print(f"  (Same machine detected)")
-                    self.receiver_ip = "127.0.0.1"
-            except:
-                pass
+            if self.receiver_ip == get_local_ip():
+                print(f"  (Same machine detected)")
+                self.receiver_ip = "127.0.0.1"
             print(f"✓ Receiver found at {self.receiver_ip}:{self.receiver_port}")
             return True
         
@@ -99,45 +108,52 @@ class FileSender:
         return False
     
     def notify_receiver_to_open_camera(self):
-        """Send signal to receiver to open camera for gesture acceptance"""
+        """
+        Send signal to receiver to open camera for gesture acceptance
+        
+        On ACCEPTED the connection is kept in self.transfer_sock and the file
+        is sent over it by send_file_data() - no second connection.
+        """
         try:
             print(f"Connecting to receiver at {self.receiver_ip}:{self.receiver_port}...")
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            tune_transfer_socket(sock)
             sock.settimeout(10)  # 10 seconds to connect
             sock.connect((self.receiver_ip, self.receiver_port))
             print("✓ Connected to receiver")
             
-            # Send camera open signal with file info
-            signal = json.dumps({
-                "type": "OPEN_CAMERA",
-                "file_name": os.path.basename(self.selected_file),
-                "file_size": os.path.getsize(self.selected_file),
-                "sender_ip": socket.gethostbyname(socket.gethostname())
-            }).encode()
-            
-            sock.sendall(len(signal).to_bytes(4, 'big'))
-            sock.sendall(signal)
+            # Send camera open signal with file info (one binary message)
+            sock.sendall(pack_message(
+                MSG_OPEN_CAMERA,
+                self.file_name,
+                self.file_size
+            ))
             print("Signal sent, waiting for receiver to accept with gesture...")
             print("(Receiver needs to make OPEN PINCH gesture)")
             print("(No timeout - waiting indefinitely...)")
             
-            # Wait for receiver response - NO TIMEOUT (wait indefinitely)
+            # Wait for receiver response - NO TIMEOUT (wait indefinitely), but
+            # in short slices so Ctrl+C still cancels on every platform
             sock.settimeout(None)
-            response_len_data = sock.recv(4)
-            if not response_len_data:
+            try:
+                wait_readable(sock)
+                response_type, _, _ = recv_message(sock)
+            except ConnectionError:
                 print("✗ No response from receiver")
                 sock.close()
                 return False
-            response_len = int.from_bytes(response_len_data, 'big')
-            response = json.loads(sock.recv(response_len).decode())
-            
-            sock.close()
+            except KeyboardInterrupt:
+                print("\n✗ Cancelled while waiting for receiver")
+                sock.close()
+                return False
             
-            if response.get("type") == "ACCEPTED":
+            if response_type == MSG_ACCEPTED:
                 print("✓ Receiver accepted!")
+                self.transfer_sock = sock
                 return True
             else:
                 print("✗ Receiver declined")
+                sock.close()
                 return False
                 
         except Exception as e:
@@ -147,11 +163,31 @@ class FileSender:
             return False
     
     def send_file_data(self):
-        """Send the actual file data to receiver"""
-        return FileTransfer.send_file(
-            self.selected_file,
-            self.receiver_ip,
-            self.receiver_port
+        """Send the actual file data to receiver over the accepted connection"""
+        sock, self.transfer_sock = self.transfer_sock, None
+        return FileTransfer.send_file_on(sock, self.selected_file)
+    
+    def _file_info_overlay(self, frame_width):
+        """
+        Render the file and receiver labels once into a bottom-of-frame strip
+        
+        The labels don't change during a transfer, so each frame gets a masked
+        copy instead of two rounds of Hershey glyph rasterization.
+        
+        Args:
+            frame_width: Width of the camera frame
+            
+        Returns:
+            tuple: (strip, mask) for blit_text_strip()
+        """
+        return render_text_strip(
+            [
+                (f"File: {self.file_name}", SENDER_INFO_STRIP_HEIGHT - 40),
+                (f"To: {self.receiver_ip}", SENDER_INFO_STRIP_HEIGHT - 10),
+            ],
+            frame_width,
+            SENDER_INFO_STRIP_HEIGHT,
+            0.6
         )
     
     def start_gesture_detection(self):
@@ -162,76 +198,55 @@ class FileSender:
         print("Starting camera...")
         
         # Open camera
-        import platform
-        if platform.system() == 'Windows':
-            cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
-        else:
-            cap = cv2.VideoCapture(CAMERA_INDEX)
-        
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        cap = open_camera()
         
         if not cap.isOpened():
             print("✗ Error: Could not open camera")
             return False
         
-        # Warmup camera
+        # Warmup - until exposure settles, at most 200 ms
         print("Warming up camera...")
-        for _ in range(10):
-            cap.read()
-            time.sleep(0.05)
+        warm_up(cap)
         
         print("✓ Camera started")
         print("\nMake PINCH gesture (thumb + index finger) to send file")
         print("Press 'q' to cancel")
         
         window_name = "Sender - Make Pinch Gesture to Send"
-        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL | cv2.WINDOW_GUI_NORMAL)
+        
+        # Capture on a background thread so each loop iteration gets the freshest frame
+        reader = CameraReader(cap)
+        reader.start()
         
         gesture_completed = False
+        info_overlay = None  # (strip, mask), rendered on the first frame
         
         try:
             consecutive_failures = 0
             max_failures = 30
+            mirrored = None  # Reused flip buffer
             
             while True:
-                ret, frame = cap.read()
+                ret, frame = reader.read_latest()
                 if not ret:
                     consecutive_failures += 1
                     if consecutive_failures >= max_failures:
                         print("✗ Camera read failed")
                         break
-                    time.sleep(0.033)
                     continue
                 
                 consecutive_failures = 0
-                frame = cv2.flip(frame, 1)
+                frame = mirrored = mirror(frame, mirrored)
                 
                 # Process for pinch gesture
                 processed_frame, gesture_detected = self.gesture_detector.process_frame(frame)
                 
                 # Show file info
                 if self.selected_file:
-                    file_name = os.path.basename(self.selected_file)
-                    cv2.putText(
-                        processed_frame,
-                        f"File: {file_name}",
-                        (10, processed_frame.shape[0] - 40),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.6,
-                        (255, 255, 255),
-                        2
-                    )
-                    cv2.putText(
-                        processed_frame,
-                        f"To: {self.receiver_ip}",
-                        (10, processed_frame.shape[0] - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.6,
-                        (255, 255, 255),
-                        2
-                    )
+                    if info_overlay is None or info_overlay[0].shape[1] != processed_frame.shape[1]:
+                        info_overlay = self._file_info_overlay(processed_frame.shape[1])
+                    blit_text_strip(processed_frame, info_overlay)
                 
                 cv2.imshow(window_name, processed_frame)
                 
@@ -256,7 +271,7 @@ class FileSender:
                     cv2.waitKey(1000)
                     break
                 
-                key = cv2.waitKey(1) & 0xFF
+                key = poll_key()
                 if key == ord('q'):
                     print("\nCancelled by user")
                     break
@@ -266,9 +281,13 @@ class FileSender:
         finally:
             # CLOSE CAMERA after gesture
             print("Closing sender camera...")
-            cap.release()
+            if reader.stop():
+                cap.release()
+            else:
+                print("  Capture thread did not stop - leaving camera to process exit")
             cv2.destroyAllWindows()
-            self.gesture_detector.cleanup()
+            # Keep the MediaPipe graph for the next transfer; only drop state
+            self.gesture_detector.reset()
             print("✓ Sender camera closed")
         
         return gesture_completed
@@ -293,9 +312,6 @@ class FileSender:
             else:
                 print(f"\n✓ Using receiver: {self.receiver_ip}:{self.receiver_port}")
             
-            # Reset gesture detector for new transfer
-            self.gesture_detector = GestureDetector()
-            
             # Step 3: Start camera and wait for pinch gesture
             if not self.start_gesture_detection():
                 print("\nGesture not completed")
@@ -349,6 +365,7 @@ class FileSender:
 
 def main():
     """Entry point"""
+    sender = None
     try:
         sender = FileSender()
         sender.run()
@@ -356,6 +373,9 @@ def main():
         print(f"\n✗ Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if sender is not None:
+            sender.close()
     
     # Keep window open
     print("\n")